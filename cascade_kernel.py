@@ -0,0 +1,126 @@
+'''
+This module contains the compiled cascade kernels of the self-organized dragon king model.
+
+The kernels operate directly on the CSR arrays and status array of a `Network`.
+Signatures are given explicitly, so the kernels are compiled (or loaded from cache) at import
+rather than on their first call during a simulation.
+'''
+
+
+import numpy as np
+from numba import njit
+
+
+@njit('Tuple((int32[::1], int64))(int32[::1], int32[::1], int8[::1], int32[::1], int64[::1])', cache=True)
+def in_cascade(indptr, indices, status, seeds, trace):
+    '''
+    Description
+    -----------
+    Cascades failures in place until no more failures occur.
+
+    Failed nodes fail their weak neighbors, one breadth-first iteration at a time.
+    Strong nodes cannot fail.
+
+    Parameters
+    ----------
+    `indptr`, `indices` : NDArray
+        The CSR arrays of the network.
+    `status` : NDArray
+        The statuses of all nodes, modified in place.
+    `seeds` : NDArray
+        The failed nodes (status 0) the cascade starts from, without duplicates.
+    `trace` : NDArray
+        Receives the number of failed nodes after each iteration, should hold at least `n + 1` values.
+
+    Returns
+    -------
+    An array containing all failed nodes and the number of iterations.
+    '''
+    # Queue the nodes the cascade starts from
+    queue = np.empty(status.size, dtype=np.int32)
+    queue[:seeds.size] = seeds
+    tail = seeds.size
+    trace[0] = tail
+
+    # Each iteration only visits the neighbors of the nodes failed in the previous one
+    head = 0
+    n_iterations = 0
+    while head < tail:
+        end = tail
+        for i in range(head, end):
+            u = queue[i]
+            for k in range(indptr[u], indptr[u + 1]):
+                v = indices[k]
+                if status[v] == 1:
+                    status[v] = 0
+                    queue[tail] = v
+                    tail += 1
+        head = end
+        n_iterations += 1
+        trace[n_iterations] = tail
+
+    return queue[:tail], n_iterations
+
+
+@njit('Tuple((int32[::1], int64))(int32[::1], int32[::1], int8[::1], int32[::1], int8[::1], int64[::1])', cache=True)
+def cc_cascade(indptr, indices, status, seeds, n_failed, trace):
+    '''
+    Description
+    -----------
+    Cascades complex contagion failures in place until no more failures occur.
+
+    Weak nodes fail once 1 neighbor has failed, strong nodes once 2 neighbors have failed,
+    i.e. a node fails when its number of failed neighbors reaches its status.
+    Every edge is processed at most once.
+
+    Parameters
+    ----------
+    `indptr`, `indices` : NDArray
+        The CSR arrays of the network.
+    `status` : NDArray
+        The statuses of all nodes, modified in place.
+    `seeds` : NDArray
+        The failed nodes (status 0) the cascade starts from, without duplicates.
+    `n_failed` : NDArray
+        Scratch counters of failed neighbors, must be all zero and is left all zero.
+    `trace` : NDArray
+        Receives the number of failed nodes after each iteration, should hold at least `n + 1` values.
+
+    Returns
+    -------
+    An array containing all failed nodes and the number of iterations.
+    '''
+    # Queue the nodes the cascade starts from
+    queue = np.empty(status.size, dtype=np.int32)
+    queue[:seeds.size] = seeds
+    tail = seeds.size
+    trace[0] = tail
+
+    # Each iteration only visits the neighbors of the nodes failed in the previous one
+    head = 0
+    n_iterations = 0
+    while head < tail:
+        end = tail
+        for i in range(head, end):
+            u = queue[i]
+            for k in range(indptr[u], indptr[u + 1]):
+                v = indices[k]
+                if status[v] != 0:
+                    # Counts saturate at 2, the highest threshold
+                    if n_failed[v] < 2:
+                        n_failed[v] += 1
+                    if n_failed[v] >= status[v]:
+                        status[v] = 0
+                        queue[tail] = v
+                        tail += 1
+        head = end
+        n_iterations += 1
+        trace[n_iterations] = tail
+
+    # Only neighbors of failed nodes were counted, reset just those
+    for i in range(tail):
+        u = queue[i]
+        for k in range(indptr[u], indptr[u + 1]):
+            n_failed[indices[k]] = 0
+
+    return queue[:tail], n_iterations
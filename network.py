@@ -7,6 +7,7 @@ Running this module as a script will generate an example network.
 
 import networkx as nx
 import numpy as np
+from numba import njit
 
 
 class Network:
@@ -18,6 +19,12 @@ class Network:
 	----------
 	graph : networkx.Graph
 		The network graph
+	indptr : NDArray
+		CSR row pointers, the neighbors of node `u` are `indices[indptr[u]:indptr[u+1]]`
+	indices : NDArray
+		CSR column indices (neighbor ids)
+	status : NDArray
+		The status of every node
 
 	Methods
 	-------
@@ -27,9 +34,13 @@ class Network:
 		Get the status of a node
 	get_all_statuses()
 		Get the statuses of all nodes
+	reset_status()
+		Make all nodes weak again
 	'''
 
-	def __init__(self, n, m=None, p=None):
+	__slots__ = ('_graph', 'indptr', 'indices', 'status')
+
+	def __init__(self, n, m=None, p=None, rng=None):
 		'''
 		Description
 		-----------
@@ -44,18 +55,45 @@ class Network:
 		Number of edges
 		`p` : float
 		Probability of an edge
+		`rng` : Generator
+		Random generator the edges are drawn from, a fresh one if `None`
 		'''
+		self._graph = None
+		rng = np.random.default_rng() if rng is None else rng
 		if m is not None:
-			self.graph = nx.gnm_random_graph(n, m)
+			u, v = _gnm_edges(n, m, rng)
 		elif p is not None:
-			self.graph = nx.erdos_renyi_graph(n, p)
+			# The compiled sampler has its own random state, seed it from `rng`
+			_seed_compiled_rng(int(rng.integers(2**32)))
+			u, v = _gnp_edges(n, p)
 		else:
 			raise ValueError("Either m or p must be provided.")
+
+		# Flatten the adjacency into CSR arrays for the hot path
+		self.indptr, self.indices = _to_csr(n, u, v)
+
+		# All nodes start out weak
+		self.status = np.ones(n, dtype=np.int8)
 		
 
+	@property
+	def graph(self):
+		'''
+		The network as a networkx.Graph, only built on first access (e.g. for visualization).
+		'''
+		if self._graph is None:
+			n = self.indptr.size - 1
+			rows = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.indptr))
+			upper = rows < self.indices
+			self._graph = nx.Graph()
+			self._graph.add_nodes_from(range(n))
+			self._graph.add_edges_from(zip(rows[upper].tolist(), self.indices[upper].tolist()))
+		return self._graph
+
+
 	def set_status(self, node, status):
 		if status in [0, 1, 2]:
-			nx.set_node_attributes(self.graph, {node: status}, 'status')
+			self.status[node] = status
 		else:
 			raise ValueError("Status must be 0, 1, or 2.")
 
@@ -66,54 +104,187 @@ class Network:
 		'''
 		if len(nodes) != len(statuses):
 			raise ValueError("Nodes and statuses must be the same length.")
-		for node, status in zip(nodes, statuses):
-			self.set_status(node, status)
+		statuses = np.asarray(statuses)
+		if not np.isin(statuses, [0, 1, 2]).all():
+			raise ValueError("Status must be 0, 1, or 2.")
+		self.status[np.asarray(nodes, dtype=np.intp)] = statuses
 
 	
 	def set_all_statuses(self, status):
 		'''
 		Sets the statuses of all nodes.
+
+		`status` may be a single value or an array of length `n`.
 		'''
-		nx.set_node_attributes(self.graph, status, 'status')
+		self.status[:] = status
+
+
+	def reset_status(self):
+		'''
+		Resets all nodes to weak, keeping the topology.
+		'''
+		self.status[:] = 1
 	
 
 	def get_status(self, node):
 		'''
 		Returns the status of a node.
 		'''
-		return nx.get_node_attributes(self.graph, 'status')[node]
+		return self.status[node]
 
 
 	def get_statuses(self, nodes):
 		'''
 		Returns the statuses of an array of nodes.
 		'''
-		return np.array([self.get_status(node) for node in nodes])  # TODO check if this is a bottleneck
+		return self.status[np.asarray(nodes, dtype=np.intp)]
 
 
 	def get_all_statuses(self):
 		'''
 		Returns the statuses of all nodes.
+
+		NOTE: this is a view on the status array, copy it before mutating the network if it should be kept.
 		'''
-		return nx.get_node_attributes(self.graph, 'status')
+		return self.status
 	
 
 	def get_neighbors(self, node, as_list=False):
 		'''
-		Returns the neighbors of a node.
+		Returns the neighbors of a node, as a list if `as_list` is `True`.
+
+		NOTE: by default this is a view on the CSR indices, it must not be modified.
 		'''
-		return self.graph.neighbors(node) if not as_list else list(self.graph.neighbors(node))
+		neighbors = self.indices[self.indptr[node]:self.indptr[node + 1]]
+		return neighbors if not as_list else neighbors.tolist()
 	
 	
 	def get_multiple_neighbors(self, nodes, as_list=False):
 		'''
 		Returns the neighbors of an array of nodes.
 		'''
-		# TODO see if this is a bottleneck
-		neighbors = []
-		for node in nodes:
-			neighbors.append(self.get_neighbors(node)) if not as_list else neighbors.append(list(self.graph.neighbors(node)))
-		return neighbors
+		return [self.get_neighbors(node, as_list) for node in nodes]
+
+
+def _gnm_edges(n, m, rng):
+	'''
+	Description
+	-----------
+	Samples the edges of a G(n, m) random graph.
+
+	Every unordered node pair has an index, `m` distinct indices are drawn without
+	replacement and decoded back to their pairs, which is a uniform sample of `m` edges.
+	If `m` covers all pairs the graph is complete and nothing is drawn.
+
+	Parameters
+	----------
+	`n` : int
+		Number of nodes
+	`m` : int
+		Number of edges, clamped to all n * (n - 1) / 2 node pairs
+	`rng` : Generator
+		Random generator the node pairs are drawn from
+
+	Returns
+	-------
+	The endpoints `u` and `v` of every edge.
+	'''
+	n_pairs = n * (n - 1) // 2
+	if m >= n_pairs:
+		u, v = np.triu_indices(n, k=1)
+		return u.astype(np.int32), v.astype(np.int32)
+
+	# The pair (u, v) with u < v has index v * (v - 1) / 2 + u
+	keys = rng.choice(n_pairs, size=m, replace=False)
+	v = ((1 + np.sqrt(1 + 8 * keys.astype(np.float64))) // 2).astype(np.int64)
+
+	# Correct the rare off-by-one from rounding the square root
+	v -= v * (v - 1) // 2 > keys
+	v += (v + 1) * v // 2 <= keys
+	u = keys - v * (v - 1) // 2
+	return u.astype(np.int32), v.astype(np.int32)
+
+
+@njit(cache=True)
+def _seed_compiled_rng(seed):
+	'''
+	Seeds the random state used by compiled functions, which is separate from NumPy's.
+	'''
+	np.random.seed(seed)
+
+
+@njit(cache=True)
+def _gnp_edges(n, p):
+	'''
+	Description
+	-----------
+	Samples the edges of a G(n, p) random graph.
+
+	Skips over absent edges with geometrically distributed gaps (Batagelj & Brandes, 2005),
+	so only O(n + m) random numbers are drawn.
+
+	Parameters
+	----------
+	`n` : int
+		Number of nodes
+	`p` : float
+		Probability of an edge
+
+	Returns
+	-------
+	The endpoints `u` and `v` of every edge.
+	'''
+	capacity = int(1.1 * p * n * (n - 1) / 2) + 16
+	u = np.empty(capacity, dtype=np.int32)
+	v = np.empty(capacity, dtype=np.int32)
+	if p <= 0:
+		return u[:0], v[:0]
+
+	log_q = np.log(1.0 - p)
+	n_edges = 0
+	row = 1
+	col = -1
+	while row < n:
+		col += 1 + int(np.log(1.0 - np.random.random()) / log_q)
+		while col >= row and row < n:
+			col -= row
+			row += 1
+		if row < n:
+			# Grow the buffers if the estimate was too small
+			if n_edges == capacity:
+				capacity *= 2
+				u = np.concatenate((u, np.empty_like(u)))
+				v = np.concatenate((v, np.empty_like(v)))
+			u[n_edges] = row
+			v[n_edges] = col
+			n_edges += 1
+
+	return u[:n_edges], v[:n_edges]
+
+
+def _to_csr(n, u, v):
+	'''
+	Description
+	-----------
+	Builds the CSR arrays of an undirected graph from its edge list.
+
+	Parameters
+	----------
+	`n` : int
+		Number of nodes
+	`u`, `v` : NDArray
+		Endpoints of every edge
+
+	Returns
+	-------
+	The `indptr` and `indices` arrays.
+	'''
+	rows = np.concatenate((u, v))
+	cols = np.concatenate((v, u))
+	order = np.argsort(rows, kind='stable')
+	indptr = np.zeros(n + 1, dtype=np.int32)
+	np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+	return indptr, cols[order].astype(np.int32)
 
 
 if __name__ == "__main__":
@@ -134,3 +305,9 @@ if __name__ == "__main__":
 	neighbors = network.get_multiple_neighbors(nodes, as_list=True)
 	print(f"Neighbors of nodes 1, 10, 100, 1_000, 10_000, 100_000: {neighbors}")
 
+	# Creating complete networks, asking for more edges than node pairs gives the complete graph as well
+	for n_edges in [1_000 * 999 // 2, 1_000_000]:
+		complete = Network(n=1_000, m=n_edges)
+		assert (np.diff(complete.indptr) == 999).all()
+		print(f"Generated a complete network with {complete.indices.size // 2} edges for m = {n_edges}.")
+
@@ -12,7 +12,7 @@ import numpy as np
 from network import Network
 
 
-def degrade(network:Network, node=None, random=False):
+def degrade(network:Network, node=None, random=False, rng=None):
 	'''
 	Description
 	-----------
@@ -27,12 +27,22 @@ def degrade(network:Network, node=None, random=False):
 		The node to degrade.
 	`random` : bool
 		Whether to choose a random node to degrade.
+	`rng` : Generator
+		The random generator used to choose the node, a fresh one if `None`.
+
+	Returns
+	-------
+	`True` if the degraded node failed, `False` otherwise.
 	'''
 	if node is None and not random:
 		raise ValueError("Either a node or random must be provided.")
 	if random:
-		node = np.random.choice(network.graph.nodes)
-	network.set_status(node, int(network.get_status(node) - 1))
+		rng = np.random.default_rng() if rng is None else rng
+		node = rng.integers(network.status.size)
+	if network.status[node] == 0:
+		raise ValueError("A failed node cannot be degraded.")
+	network.status[node] -= 1
+	return bool(network.status[node] == 0)
 
 
 def fail(network:Network, nodes):
@@ -48,7 +58,7 @@ def fail(network:Network, nodes):
 	`nodes` : NDArray
 		The array of nodes to fail.
 	'''
-	network.set_statuses(nodes, np.zeros(len(nodes), dtype=int))
+	network.status[np.asarray(nodes, dtype=np.intp)] = 0
 
 
 def save_state(network:Network, verbose=False):
@@ -62,8 +72,9 @@ def save_state(network:Network, verbose=False):
 	`network` : Network
 		The network to save the state of.
 	'''
-	print("Saving state...") if verbose else None
-	return network.get_all_statuses()
+	if verbose:
+		print("Saving state...")
+	return network.get_all_statuses().copy()
 
 
 def load_state(network:Network, previous_state):
@@ -84,19 +95,28 @@ def load_state(network:Network, previous_state):
 	network.set_all_statuses(previous_state)
 
 
-def reinforce(network:Network, nodes, epsilon):
+def reinforce(network:Network, nodes, epsilon, rng=None):
 	'''
 	Description
 	-----------
 	Reinforce failed an array of nodes with probability epsilon.
 
-	TODO add numpy enhancement to remove this additional loop (use an array of probabilities)
+	Nodes that are not reinforced are repaired as weak.
+
+	Parameters
+	----------
+	`network` : Network
+		The network to reinforce.
+	`nodes` : NDArray
+		The array of failed nodes.
+	`epsilon` : float
+		The probability that a node is repaired as strong.
+	`rng` : Generator
+		The random generator used for the draws, a fresh one if `None`.
 	'''
-	for node in nodes:
-		if np.random.rand() < epsilon:
-			network.set_status(node, 2)
-		else:
-			network.set_status(node, 1)
+	rng = np.random.default_rng() if rng is None else rng
+	reinforced = rng.random(len(nodes)) < epsilon
+	network.status[np.asarray(nodes, dtype=np.intp)] = np.where(reinforced, 2, 1)
 
 
 if __name__ == "__main__":
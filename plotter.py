@@ -1,12 +1,11 @@
-import json
-
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import numpy as np
 
 
 def plot_results(n_nodes=10_000):
     # Initialize the plot
-    plt.figure()
+    _, ax = plt.subplots()
     plt.xlabel('s')
     plt.ylabel('Pr(s)')
     # plt.xscale('log')
@@ -14,17 +13,13 @@ def plot_results(n_nodes=10_000):
     plt.title('Cascade Size Distribution')
     plt.grid(True)
 
-    # Read the data from the file
-    with open('exports/results.txt', 'r') as f:
-        for line in f:
-            try:
-                data = json.loads(line)
-                # plt.plot(np.array(list(data.values()))* n_nodes, list(data.values()))
-                plt.plot(dict(data).keys(), data.values())
-                # print(dict(data).keys())
-            except:
-                # a zero entry is found
-                pass
+    # Read the data from the archive (steps without a failure are not stored)
+    with np.load('exports/results.npz') as results:
+        segments = [np.column_stack((np.arange(cascade.size), cascade)) for cascade in results.values()]
+
+    # Draw all cascades as a single collection
+    ax.add_collection(LineCollection(segments))
+    ax.autoscale()
     
     plt.show()
             
@@ -2,6 +2,9 @@ import networkx as nx
 import matplotlib.pyplot as plt
 import numpy as np
 
+from cascade_kernel import in_cascade
+from network import Network
+
 class NodeNetworkSimulator:
 
     '''
@@ -11,7 +14,7 @@ class NodeNetworkSimulator:
     and one for the simulation.
     '''
 
-    def __init__(self, n_nodes, pr_edge, epsilon=0.2):
+    def __init__(self, n_nodes, pr_edge, epsilon=0.2, visualize=False, seed=None):
         '''
         Description
         -----------
@@ -25,32 +28,41 @@ class NodeNetworkSimulator:
             The probability that two nodes will be connected.
         `epsilon` : float
             The probability that a weak node will be repaired as strong.
+        `visualize` : bool
+            Whether, per step, the network should be plotted. CAUTION only use with very small `n_nodes`.
+        `seed` : int
+            The seed of the random generator, fresh entropy if `None`.
         '''
+        self.rng = np.random.default_rng(seed)
         self.number_of_nodes = n_nodes
         self.pr_edge = pr_edge
         self.network = self.initialize_network()
+        self._trace = np.empty(n_nodes + 1, dtype=np.int64)  # cascade sizes, required by the kernel
         self.current_step = 0
         self.epsilon = epsilon
+        self.visualize = visualize
+        self._pos = None  # node layout, computed on the first plot
 
 
     def initialize_network(self):
         '''
         Initializes a network with random edges and assigns
         a status of 1 to each node.
+
+        The network keeps its adjacency as CSR arrays and
+        the statuses as an int8 array.
         
         TODO: Add a parameter to allow the user to specify
         the number of nodes or probability.
         '''
-        G = nx.gnp_random_graph(self.number_of_nodes, self.pr_edge)
-        nx.set_node_attributes(G, 1, 'status')
-        return G
+        return Network(self.number_of_nodes, p=self.pr_edge, rng=self.rng)
 
 
-    def random_node(self):
+    def random_node(self, size=None):
         '''
-        Returns a random node from the network.
+        Returns a random node from the network, or an array of `size` random nodes.
         '''
-        return np.random.choice(self.network.nodes)
+        return self.rng.integers(self.number_of_nodes, size=size, dtype=np.int32)
 
 
     def update_status(self, node, by):
@@ -68,8 +80,8 @@ class NodeNetworkSimulator:
             A negative value will decrease the node's status.
             A positive value will increase the node's status.
         '''
-        self.network.nodes[node]['status'] += by
-        failed = self.network.nodes[node]['status'] == 0
+        self.network.status[node] += by
+        failed = self.network.status[node] == 0
 
         # # show the network
         # self.visualize_network()
@@ -77,24 +89,17 @@ class NodeNetworkSimulator:
         return failed
 
 
-    def process_neighbors(self):
+    def process_neighbors(self, node):
         '''
-        Check the status of each neighbor of a failed node.
-        If the neighbor is weak, it fails.
+        Fail the weak neighbors of a failed node, then
+        the weak neighbors of those, until no more fail.
+
+        The cascade runs in the compiled `in_cascade` kernel.
+
+        Returns the number of failed nodes.
         '''
-        # TODO: Refactor to keep track of failed nodes and only process those
-        changed = False
-        for node in self.network.nodes:
-            if self.network.nodes[node]['status'] == 0:
-                for neighbor in self.network.neighbors(node):
-                    if self.network.nodes[neighbor]['status'] == 1:
-                        self.network.nodes[neighbor]['status'] = 0
-                        changed = True
-        
-        # # show the network
-        # self.visualize_network()
-        
-        return changed
+        failed_nodes, _ = in_cascade(self.network.indptr, self.network.indices, self.network.status, np.array([node], dtype=np.int32), self._trace)
+        return failed_nodes.size
 
 
     def repair_nodes(self):
@@ -103,55 +108,64 @@ class NodeNetworkSimulator:
         
         TODO: Refactor to include CC version
         '''
-        for node in self.network.nodes:
-            self.network.nodes[node]['status'] = 1 if np.random.rand() > self.epsilon else 2
-
-
-    def _get_failure_size(self):
-        '''
-        Returns the proportion of nodes with status = 0.
-        '''
-        data = self.network.nodes.data()
-        state = [node[1]['status'] for node in data]
-        rel_size = 1 - (np.count_nonzero(state) / len(state))
-        return rel_size
+        self.network.status[:] = np.where(self.rng.random(self.number_of_nodes) > self.epsilon, 1, 2)
 
 
     def _visualize_network(self):
         '''
         Visualize the network with yellow nodes representing
-        weak nodes and red nodes representing strong nodes.
+        weak nodes, green nodes representing strong nodes and
+        red nodes representing failed nodes.
         '''
-        # TODO: Refactor this method to be more efficient and readable
-        color_map = ['yellow' if self.network.nodes[node]['status'] == 1 else ('red' if self.network.nodes[node]['status'] == 0 else 'green') for node in self.network.nodes]
-        nx.draw(self.network, node_color=color_map)
+        if self._pos is None:
+            self._pos = nx.spring_layout(self.network.graph)
+        color_map = np.array(['red', 'yellow', 'green'])[self.network.status]
+        nx.draw(self.network.graph, pos=self._pos, node_color=color_map)
         plt.title(f"Time Step: {self.current_step}")
         # plt.show()
         plt.savefig(f"images/{self.current_step}.png")
+        plt.clf()
 
 
-    def simulate(self, steps):
-        
+    def simulate(self, steps, verbose=False):
+        '''
+        Description
+        -----------
+        Simulate a number of time steps.
+
+        Parameters
+        ----------
+        `steps` : int
+            The number of time steps to simulate.
+        `verbose` : bool
+            Whether the relative size of every failure should be printed.
+
+        Returns
+        -------
+        The relative failure sizes, in order of occurrence.
+        '''
         failure_sizes = []
 
-        for _ in range(steps):
-            
-            # # show the network
-            # self.visualize_network()
+        # draw the random node of every time step at once
+        rand_nodes = self.random_node(steps)
+
+        for step_i in range(steps):
             
-            # print(f"Time Step: {self.current_step}, n_nodes: {self.number_of_nodes}, n_edges: {self.network.number_of_edges()}, n_weak: {len([node for node in self.network.nodes if self.network.nodes[node]['status'] == 1])}, n_strong: {len([node for node in self.network.nodes if self.network.nodes[node]['status'] == 2])}", end='\r')
+            # show the network
+            if self.visualize:
+                self._visualize_network()
 
             # update the status of a random node
             # TODO: Refactor this dirty solution:
-            node = self.random_node()
+            node = rand_nodes[step_i]
             failed = self.update_status(node, -1)  # returns True if updated node failed
             if failed:
-                while self.process_neighbors():
-                    pass
+                n_failed = self.process_neighbors(node)
                 
-                rel_size = self._get_failure_size()
+                rel_size = n_failed / self.number_of_nodes
                 failure_sizes.append(rel_size)
-                print(f'Relative failure size: {rel_size}               ', end='\r')
+                if verbose:
+                    print(f'Relative failure size: {rel_size}               ', end='\r')
                 self.repair_nodes()
 
             self.current_step += 1
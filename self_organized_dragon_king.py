@@ -6,21 +6,23 @@ The model consists of two versions:
         a. Nodes of status 1 (weak) fail if 1 or more neighbors fail.
         b. Nodes of status 2 (strong) cannot fail.
     
-    2. TODO Complex contagion or CC:
+    2. Complex contagion or CC:
         a. Nodes of status 1 (weak) fail if 1 or more neighbors fail.
         b. Nodes of status 2 (strong) fail if 2 or more neighbors fail.
 
 Running this module as a script run an example.
 '''
 
-import json
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 
 import numpy as np
 import matplotlib.pyplot as plt
 import networkx as nx
 
+from cascade_kernel import cc_cascade, in_cascade
 from network import Network
-from network_modifier import degrade, fail, save_state, load_state, reinforce
+from network_modifier import degrade, reinforce
 
 
 class Inoculation:
@@ -29,7 +31,7 @@ class Inoculation:
     Class to simulate the inoculation version of the self-organized dragon king model.
     '''
 
-    def __init__(self, n_steps, n_trials, n_nodes, n_edges=None, pr_edge=None, epsilon=0.2, verbose=False, visualize=False, export_dir=None):
+    def __init__(self, n_steps, n_trials, n_nodes, n_edges=None, pr_edge=None, epsilon=0.2, verbose=False, visualize=False, export_dir=None, n_jobs=1, share_network=False, seed=None):
         '''
         Description
         -----------
@@ -56,21 +58,31 @@ class Inoculation:
         `export_dir` : str
             Whether the resulting failure size distributions should be exported. If `None` (default), no export will take place. 
             Otherwise, the string should contain the path to the export directory (e.g. 'exports/').
+        `n_jobs` : int
+            The number of worker processes the trials are distributed over. Defaults to 1 (serial).
+            CAUTION only use `visualize` with `n_jobs=1`.
+        `share_network` : bool
+            Whether all trials run on the same topology, only resetting the statuses in between.
+            If `False` (default), every trial after the first runs on a newly generated network.
+        `seed` : int
+            The seed all random streams of the simulation are spawned from, networks included.
+            If `None` (default), fresh entropy is used.
         '''
 
         # Initialize the network
         self.n_nodes = n_nodes
         self.n_edges = n_edges
         self.pr_edge = pr_edge
-        self.network = Network(n_nodes, n_edges, pr_edge)
-        
-        # Initialize the state
-        self.network.set_all_statuses(1)
+        self._seed_sequence = np.random.SeedSequence(seed)
+        network_seed, = self._seed_sequence.spawn(1)
+        self.network = Network(n_nodes, n_edges, pr_edge, rng=np.random.default_rng(network_seed))
 
         # Initialize the parameters
         self.epsilon = epsilon
         self.n_steps = n_steps
         self.n_trials = n_trials
+        self.n_jobs = n_jobs
+        self.share_network = share_network
         
         # Initialize the current step
         self.time = 0
@@ -81,7 +93,8 @@ class Inoculation:
         self.export_dir = export_dir
 
         # Initialize the export directory
-        if export_dir is not None:
+        self.exporting = export_dir is not None
+        if self.exporting:
             self._initialize_results()
 
 
@@ -91,27 +104,71 @@ class Inoculation:
         -----------
         Runs the simulation.
         '''
-        # Loop through trials
-        for self._itrial in np.arange(1, self.n_trials + 1):
-            
-            # Loop through the number of steps
-            for self._istep in np.arange(1, self.n_steps + 1):
-                
-                if not self.verbose:
-                    # If verbose is False (default), display a progress bar
-                    print(f"Starting trial {self._itrial} of {self.n_trials}  |  Step {self._istep} of {self.n_steps}               ", end='\r')
-                
-                # Execute a single step
-                self.step()
-
-            # Re-initialize the network
-            self.network = Network(self.n_nodes, self.n_edges, self.pr_edge)
+        # Independent random streams for every trial
+        seeds = self._seed_sequence.spawn(self.n_trials)
+        trials = range(1, self.n_trials + 1)
+
+        if self.n_jobs == 1:
+            results = [self._run_trial(trial, seed) for trial, seed in zip(trials, seeds)]
+        else:
+            # Trials are independent, run them in fresh processes so no global random state is shared
+            with ProcessPoolExecutor(max_workers=self.n_jobs, mp_context=get_context('spawn')) as executor:
+                results = list(executor.map(self._run_trial, trials, seeds))
 
         print('\nSimulation completed.')
         
         if self.exporting:
+            self.results = results
             self._export_results()
-            print(f'Exported results to {self.export_dir}results.csv')
+            print(f'Exported results to {self.export_dir}results.npz')
+
+
+    def _run_trial(self, trial, seed):
+        '''
+        Description
+        -----------
+        Runs a single trial of the simulation.
+
+        Parameters
+        ----------
+        `trial` : int
+            The number of the trial, starting at 1.
+        `seed` : SeedSequence
+            The seed of the random stream of the trial.
+
+        Returns
+        -------
+        The stored results of the trial, `None` if not exporting.
+        '''
+        self._itrial = trial
+        self.rng = np.random.default_rng(seed)
+
+        # Either reuse the topology with fresh statuses, or run every trial after the first on a new network
+        if self.share_network:
+            self.network.reset_status()
+        elif trial > 1:
+            self.network = Network(self.n_nodes, self.n_edges, self.pr_edge, rng=self.rng)
+
+        # Failed node counts per cascade iteration, at most one iteration per node, reused by every cascade
+        self._trace = np.empty(self.n_nodes + 1, dtype=np.int64)
+
+        # Draw the nodes to degrade for every step of the trial at once
+        self._seeds = self.rng.integers(0, self.n_nodes, size=self.n_steps)
+
+        # Only refresh the progress bar every 1% of the steps
+        progress_every = max(1, self.n_steps // 100)
+
+        # Loop through the number of steps
+        for self._istep in range(1, self.n_steps + 1):
+            
+            if not self.verbose and self._istep % progress_every == 0:
+                # If verbose is False (default), display a progress bar
+                print(f"Starting trial {self._itrial} of {self.n_trials}  |  Step {self._istep} of {self.n_steps}               ", end='\r')
+            
+            # Execute a single step
+            self.step()
+
+        return self.results[trial - 1] if self.exporting else None
 
 
     def step(self):
@@ -120,96 +177,72 @@ class Inoculation:
         -----------
         Runs a single step of the simulation.
         '''
-        
-        # Save the current state (only used in cases of failure during degradation)
-        before_degrade = save_state(self.network)
 
-        # Degrade a node at random
-        degrade(self.network, random=True)
+        # Degrade the node drawn for this step
+        node = int(self._seeds[self._istep - 1])
+        failed = degrade(self.network, node=node)
+
+        # The status scan only runs for its diagnostics, only the degraded node can have failed
+        if self.verbose:
+            self.contains_failed_nodes()
 
-        if self.contains_failed_nodes():
+        if failed:
             
             # Store first failure size
             # self._store_results(1, self.trial, step) if self.exporting else None
 
             # Cascade failures until no more failures occur
-            failed_nodes = self.cascade_failures()
+            failed_nodes = self.cascade_failures(node)
 
-            # Repair nodes
-            load_state(self.network, before_degrade)
-
-            # Reinforce some of the failed nodes with status 1 given epsilon
-            reinforce(self.network, failed_nodes, self.epsilon)
+            # Repair the failed nodes, reinforcing some of them given epsilon
+            # (no snapshot is restored first, reinforce overwrites every node the step changed)
+            reinforce(self.network, failed_nodes, self.epsilon, rng=self.rng)
 
             if self.visualize:
                 return self._visualize_network()
 
         # Otherwise (i.e. no failure), end the step
-        else:
-            return self._visualize_network() if self.visualize else None
+        elif self.visualize:
+            return self._visualize_network()
     
 
-    def cascade_failures(self):
+    def cascade_failures(self, node):
         '''
         Description
         -----------
         Cascades failures until no more failures occur.
 
+        Parameters
+        ----------
+        `node` : int
+            The failed node the cascade starts from.
+
         Returns
         -------
-        An array containing all failed nodes of status 1.
+        An array containing all failed nodes.
         '''
-        # Get current statuses as values
-        current_state = np.array(list(self.network.get_all_statuses().values()))
+        # Cascade through the CSR arrays in compiled code
+        failed_nodes, n_iterations = self._cascade(np.array([node], dtype=np.int32), self._trace)
 
-        # Initialize previous state to save
-        previous_state = np.zeros_like(current_state)
-        
-        # Start tracking cascade
-        self._initialize_cascade()  if self.exporting  else None
-        
-        ### NOTE ###
-        # 
-        # The following cascading mechanism is a bit of a mess.
-        # 
-        # I think it can be simplified by circumventing the while loop
-        # and just focusing on the final state of the network.
-        #
-        # In particular, as we know the neighbors of each node, we can 
-        # concatenate all the neighbors and immediately adjust their 
-        # statuses.
-        # 
-        ############
-
-        # Cycle until no more changes in status occur
-        while not (previous_state == current_state).all():
-            
-            previous_state = current_state
-            
-            # Find failed nodes
-            failed_nodes = np.where(current_state==0)[0]
-            
-            # Locate neighbors
-            all_neighbors = self.network.get_multiple_neighbors(failed_nodes)
-            
-            # Cycle through neighbors (multiple neighbors of multiple nodes) and locate weaklings
-            for neighbors in all_neighbors:
+        # Visualize network
+        if self.visualize:
+            self._visualize_network()
 
-                fail(self.network, list(neighbors))
-
-            # Update current_state
-            current_state = np.array(list(self.network.get_all_statuses().values()))
-
-            # Visualize network
-            self._visualize_network() if self.visualize else None
+        if self.exporting:
+            # Store the cascade and the results of step
+            self._store_cascade(self._trace[:n_iterations + 1])
+            self._store_step_results()
 
-            # Store current cascade iteration
-            self._store_cascade()  if self.exporting  else None
+        return failed_nodes
 
-        # Store results of step
-        self._store_step_results() if self.exporting else None
 
-        return failed_nodes
+    def _cascade(self, seeds, trace):
+        '''
+        Description
+        -----------
+        Runs the cascade kernel of the model version.
+        '''
+        return in_cascade(self.network.indptr, self.network.indices, self.network.status, seeds, trace)
 
 
     def contains_failed_nodes(self):
@@ -222,46 +255,24 @@ class Inoculation:
         -------
         `True` if the network contains failed nodes, `False` otherwise.
         '''
-        print(f'Result of contains_failed_nodes method: {0 in self.network.get_all_statuses().values()}') if self.verbose else None
-        print(f'Found the following failured nodes: {np.argwhere(np.array(self.network.get_all_statuses().values()) == 0)}') if self.verbose else None
-        return 0 in self.network.get_all_statuses().values()
+        if self.verbose:
+            print(f'Result of contains_failed_nodes method: {0 in self.network.get_all_statuses()}')
+            print(f'Found the following failured nodes: {np.flatnonzero(self.network.get_all_statuses() == 0)}')
+        return bool(self.network.get_all_statuses().min() == 0)
     
 
-    def _initialize_cascade(self):
+    def _store_cascade(self, trace):
         '''
         Description
         -----------
-        Initialize a failure size array.
-        '''
-        self.cascade_dict = {}
-        self.cascade_counter = -1
-        self._store_cascade()
-
-
-    def _get_cascade(self):
-        '''
-        Description
-        -----------
-        Returns the failure size and counter of current cascade.
-        '''
-        status_values = list(self.network.get_all_statuses().values())
-        if len(status_values) != self.n_nodes:
-            raise ValueError("Length of all statuses does not match the specified number of nodes.")
-
-        failures = status_values.count(0)
-
-        return self.cascade_counter, failures / len(status_values)
-
+        Stores the failure size of every cascade iteration in the cascade array.
 
-    def _store_cascade(self):
-        '''
-        Description
-        -----------
-        Stores a value in the cascade dict.
+        Parameters
+        ----------
+        `trace` : NDArray
+            The number of failed nodes after each cascade iteration.
         '''
-        self.cascade_counter += 1
-        t, x = self._get_cascade()
-        self.cascade_dict[t] = x
+        self.cascade = trace / self.n_nodes
 
 
     def _visualize_network(self):
@@ -276,7 +287,7 @@ class Inoculation:
         '''
         nx.draw(
                 self.network.graph, 
-                node_color=['red' if self.network.graph.nodes[node]['status'] == 0 else ('yellow' if self.network.graph.nodes[node]['status'] == 1 else 'green') for node in self.network.graph.nodes]
+                node_color=np.array(['red', 'yellow', 'green'])[self.network.get_all_statuses()]
                 )
         plt.title(f"Time Step: {self.time}")
         plt.show()
@@ -292,8 +303,7 @@ class Inoculation:
 
         TODO switch to a pickle/file based approach to secure intermittent results.
         '''
-        self.exporting = True
-        self.results = [[0]*self.n_steps]*self.n_trials
+        self.results = [[None] * self.n_steps for _ in range(self.n_trials)]
 
     def _store_step_results(self):
         '''
@@ -301,25 +311,46 @@ class Inoculation:
         -----------
         Stores results of a step.
         '''
-        self.results[self._itrial - 1][self._istep - 1] = self.cascade_dict
-        print(f"Stored result for trial {self._itrial} and step {self._istep}.") if self.verbose else None
+        self.results[self._itrial - 1][self._istep - 1] = self.cascade
+        if self.verbose:
+            print(f"Stored result for trial {self._itrial} and step {self._istep}.")
 
     def _export_results(self):
         '''
         Description
         -----------
-        Exports stored results to csv file.
+        Exports stored results to a compressed npz archive.
+
+        Every cascade is stored under the key `t{trial}s{step}`, steps without a failure are left out.
         '''
-        with open(f'{self.export_dir}results.txt', 'w') as file:
-            for trial in np.arange(self.n_trials):
-                for step in np.arange(self.n_steps):
-                    # print(f"\nExporting result for trial {trial} and step {step}.")
-                    json.dump(self.results[trial][step], file)
-                    file.write('\n')
+        np.savez_compressed(
+            f'{self.export_dir}results.npz',
+            **{f't{trial}s{step}': cascade for trial, row in enumerate(self.results) for step, cascade in enumerate(row) if cascade is not None}
+        )
+
+
+class ComplexContagion(Inoculation):
+
+    '''
+    Class to simulate the complex contagion version of the self-organized dragon king model.
+
+    Takes the same parameters as `Inoculation`.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Failed neighbor counters of the cascade kernel, left all zero after every cascade
+        self._nfailed = np.zeros(self.n_nodes, dtype=np.int8)
 
 
-def complex_contagion():
-    pass
+    def _cascade(self, seeds, trace):
+        '''
+        Description
+        -----------
+        Runs the complex contagion cascade kernel.
+        '''
+        return cc_cascade(self.network.indptr, self.network.indices, self.network.status, seeds, self._nfailed, trace)
 
 
 if __name__ == "__main__":